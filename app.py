@@ -1,11 +1,22 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from flask_compress import Compress
 from diff_match_patch import diff_match_patch
 import requests
+import orjson
+import time
+import os
+import re
 from itertools import zip_longest
-from difflib import SequenceMatcher
+from collections import defaultdict, deque
 
 app = Flask(__name__)
+# Diff responses repeat the same JSON keys heavily and compress well
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip", "deflate"]
+# Flask-Compress cannot gzip a streamed body, only these
+app.config["COMPRESS_ALGORITHM_STREAMING"] = ["br", "deflate"]
+app.config["COMPRESS_MIN_SIZE"] = 1024
+Compress(app)
 CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "http://127.0.0.1:3000", "https://fit.neu.edu.vn", "https://courses.neu.edu.vn",
@@ -15,96 +26,155 @@ CORS(app, resources={
     }
 })
 
-def extract_text_from_item(item):
-    """Extract text and structure from a document item"""
-    if "paragraph" in item:
-        if "elements" in item["paragraph"]:
-            text = ""
-            for element in item["paragraph"]["elements"]:
-                if "textRun" in element:
-                    text += element["textRun"]["content"]
-            if text.strip():
-                style = item["paragraph"].get("paragraphStyle", {}).get("namedStyleType", "NORMAL_TEXT")
-                return {
-                    "type": "paragraph",
-                    "text": text.strip(),
-                    "style": style,
-                    "original": item
-                }
-    elif "table" in item:
+_dmp = diff_match_patch()
+_dmp.Diff_Timeout = 0.5
+
+# Texts longer than this are diffed sentence by sentence rather than per character
+SENTENCE_DIFF_MIN_LENGTH = 1024
+_SENTENCE = re.compile(r".*?(?:[.!?]+\s+|\n|$)", re.S)
+
+SYLLABUS_LIST_URL = 'https://fit.neu.edu.vn/codelab/api/syllabus-list'
+SYLLABUS_LIST_TTL = 60
+
+# Pooled connection to the syllabus API plus a short-lived copy of its list
+_session = requests.Session()
+_syllabus_list_cache = {"data": None, "expires": 0.0}
+
+def _collect_text_runs(elements, out):
+    """Append the content of every text run in elements to out"""
+    out.extend(el["textRun"]["content"] for el in elements if "textRun" in el)
+
+def _cell_text(cell):
+    """Concatenate the text of all paragraphs in a table cell"""
+    parts = []
+    for content in cell.get("content") or ():
+        paragraph = content.get("paragraph")
+        if paragraph:
+            _collect_text_runs(paragraph.get("elements") or (), parts)
+    return "".join(parts)
+
+PARAGRAPH, TABLE = 0, 1
+
+# Shared read-only default for missing nested dicts
+_EMPTY = {}
+
+def _classify(item):
+    """Return a cheap (kind, text, item) tuple for matching, or None to skip the item"""
+    if not isinstance(item, dict):
+        return None
+    # Paragraphs are the common case, so try their access chain first
+    try:
+        elements = item["paragraph"]["elements"]
+    except KeyError:
+        if "table" in item and "paragraph" not in item:
+            return (TABLE, None, item)
+        return None
+    parts = []
+    _collect_text_runs(elements, parts)
+    text = "".join(parts).strip()
+    if not text:
+        return None
+    return (PARAGRAPH, text, item)
+
+def _describe(classified):
+    """Build the full response dict for a classified item"""
+    kind, text, item = classified
+    if kind == PARAGRAPH:
+        style = item["paragraph"].get("paragraphStyle", _EMPTY).get("namedStyleType", "NORMAL_TEXT")
         return {
-            "type": "table",
-            "data": item["table"], 
+            "type": "paragraph",
+            "text": text,
+            "style": style,
             "original": item
         }
-    return None
+    return {
+        "type": "table",
+        "data": item["table"], 
+        "original": item
+    }
+
+def _diff_sentences(text1, text2):
+    """Diff two texts using whole sentences (or lines) as the unit of change"""
+    # Encode each distinct sentence as one character, diff those, then expand back
+    sentences = [""]
+    ids = {}
+
+    def encode(text):
+        chars = []
+        for sentence in _SENTENCE.findall(text):
+            if sentence:
+                if sentence not in ids:
+                    ids[sentence] = len(sentences)
+                    sentences.append(sentence)
+                chars.append(chr(ids[sentence]))
+        return "".join(chars)
+
+    chars1 = encode(text1)
+    chars2 = encode(text2)
+    diffs = _dmp.diff_main(chars1, chars2, False)
+    _dmp.diff_charsToLines(diffs, sentences)
+    return diffs
 
 def compare_text_content(text1, text2):
     """Compare two text strings and return detailed differences"""
-    matcher = SequenceMatcher(None, text1, text2)
+    if text1 == text2:
+        return []
+
+    if max(len(text1), len(text2)) > SENTENCE_DIFF_MIN_LENGTH:
+        diffs = _diff_sentences(text1, text2)
+    else:
+        diffs = _dmp.diff_main(text1, text2)
+    _dmp.diff_cleanupSemantic(diffs)
     result = []
-    
-    for op, i1, i2, j1, j2 in matcher.get_opcodes():
-        if op == 'delete':
-            result.append({
-                "type": "removed",
-                "text": text1[i1:i2],
-                "fullText": text1,
-                "range": [i1, i2]
-            })
-        elif op == 'insert':
-            result.append({
-                "type": "added",
-                "text": text2[j1:j2],
-                "fullText": text2,
-                "range": [j1, j2]
-            })
-        elif op == 'replace':
+
+    # i and j track the current offset into text1 and text2 respectively
+    i = j = 0
+    for op, text in diffs:
+        if op == diff_match_patch.DIFF_EQUAL:
+            i += len(text)
+            j += len(text)
+        elif op == diff_match_patch.DIFF_DELETE:
             result.append({
                 "type": "removed",
-                "text": text1[i1:i2],
+                "text": text,
                 "fullText": text1,
-                "range": [i1, i2]
+                "range": [i, i + len(text)]
             })
+            i += len(text)
+        elif op == diff_match_patch.DIFF_INSERT:
             result.append({
                 "type": "added",
-                "text": text2[j1:j2],
+                "text": text,
                 "fullText": text2,
-                "range": [j1, j2]
+                "range": [j, j + len(text)]
             })
+            j += len(text)
     
     return result
 
+def _table_matrix(rows):
+    """Return the text of every cell in a table's rows as a list of rows"""
+    return [[_cell_text(cell) for cell in row["tableCells"]] for row in rows]
+
 def compare_tables(table1, table2):
     """Compare two tables and return differences"""
     diffs = []
+    rows1 = table1["tableRows"]
+    rows2 = table2["tableRows"]
     
-    if len(table1["tableRows"]) != len(table2["tableRows"]):
+    if len(rows1) != len(rows2):
         return [{"type": "structure", "message": "Different number of rows"}]
+
+    # Extract each cell's text once, then diff the plain strings
+    matrix1 = _table_matrix(rows1)
+    matrix2 = _table_matrix(rows2)
         
-    for row_idx, (row1, row2) in enumerate(zip(table1["tableRows"], table2["tableRows"])):
-        if len(row1["tableCells"]) != len(row2["tableCells"]):
+    for row_idx, (cells1, cells2) in enumerate(zip(matrix1, matrix2)):
+        if len(cells1) != len(cells2):
             diffs.append({"type": "structure", "message": f"Different number of cells in row {row_idx}"})
             continue
             
-        for cell_idx, (cell1, cell2) in enumerate(zip(row1["tableCells"], row2["tableCells"])):
-            text1 = ""
-            text2 = ""
-
-            if cell1.get("content"):
-                for content in cell1["content"]:
-                    if content.get("paragraph") and content["paragraph"].get("elements"):
-                        for element in content["paragraph"]["elements"]:
-                            if element.get("textRun"):
-                                text1 += element["textRun"]["content"]
-            
-            if cell2.get("content"):
-                for content in cell2["content"]:
-                    if content.get("paragraph") and content["paragraph"].get("elements"):
-                        for element in content["paragraph"]["elements"]:
-                            if element.get("textRun"):
-                                text2 += element["textRun"]["content"]
-            
+        for cell_idx, (text1, text2) in enumerate(zip(cells1, cells2)):
             if text1 != text2:
                 if text1:
                     diffs.append({
@@ -127,81 +197,97 @@ def compare_tables(table1, table2):
     
     return diffs
 
+def _match_key(classified):
+    """Key used to pair items of the same kind across documents"""
+    kind, text, item = classified
+    if kind == PARAGRAPH:
+        return text
+    return len(item["table"]["tableRows"])
+
+def _match_items(content1, content2):
+    """Pair items across two document contents; returns (changes, added) with changes in content1 order"""
+    p1 = [c for c in map(_classify, content1) if c]
+    p2 = [c for c in map(_classify, content2) if c]
+
+    # Index content2 per kind so each item1 finds its partner in O(1):
+    # paragraphs by their text, tables by their row count
+    index2 = (defaultdict(deque), defaultdict(deque))
+    for j, classified2 in enumerate(p2):
+        index2[classified2[0]][_match_key(classified2)].append(j)
+
+    # One slot per content1 item that needs reporting: ("removed", classified1) or ("table", item1, item2)
+    slots = []
+    matched2 = set()
+    unmatched_tables1 = []
+    for classified1 in p1:
+        candidates = index2[classified1[0]].get(_match_key(classified1))
+        if candidates:
+            j = candidates.popleft()
+            matched2.add(j)
+            if classified1[0] == TABLE:
+                slots.append(("table", classified1[2], p2[j][2]))
+        else:
+            if classified1[0] == TABLE:
+                unmatched_tables1.append(len(slots))
+            slots.append(("removed", classified1))
+
+    # Tables whose row count changed still pair up in order so they report a structure diff
+    unmatched_tables2 = [j for j, classified2 in enumerate(p2) if classified2[0] == TABLE and j not in matched2]
+    for pos, j in zip(unmatched_tables1, unmatched_tables2):
+        matched2.add(j)
+        slots[pos] = ("table", slots[pos][1][2], p2[j][2])
+
+    changes = []
+    for slot in slots:
+        if slot[0] == "table":
+            item1, item2 = slot[1], slot[2]
+            changes.extend(("table", diff, item1, item2) for diff in compare_tables(item1["table"], item2["table"]))
+        else:
+            changes.append(slot)
+    added = [classified2 for j, classified2 in enumerate(p2) if j not in matched2]
+    return changes, added
+
 def diff_content(content1, content2):
     """Compare two document contents and return structured differences"""
+    changes, added = _match_items(content1, content2)
     structured_diffs = []
-    
-    for i, item1 in enumerate(content1):
-        processed1 = extract_text_from_item(item1)
-        if not processed1:
-            continue
-            
-        # Try to find a matching item in content2
-        found_match = False
-        for j, item2 in enumerate(content2):
-            processed2 = extract_text_from_item(item2)
-            if not processed2:
-                continue
-                
-            if processed1["type"] == processed2["type"]:
-                if processed1["type"] == "paragraph":
-                    if processed1["text"] != processed2["text"]:
-                        structured_diffs.append({
-                            "type": "removed",
-                            "content": processed1
-                        })
-                        structured_diffs.append({
-                            "type": "added",
-                            "content": processed2
-                        })
-                    found_match = True
-                    break
-                elif processed1["type"] == "table":
-                    table_diffs = compare_tables(processed1["data"], processed2["data"])
-                    if table_diffs:
-                        structured_diffs.extend([{
-                            "type": diff["type"],
-                            "content": {
-                                "type": "table",
-                                "data": diff,
-                                "original": processed1["original"] if diff["type"] == "removed" else processed2["original"]
-                            }
-                        } for diff in table_diffs])
-                    found_match = True
-                    break
-                    
-        if not found_match:
+
+    for change in changes:
+        if change[0] == "removed":
             structured_diffs.append({
                 "type": "removed",
-                "content": processed1
+                "content": _describe(change[1])
             })
-    
-    for item2 in content2:
-        processed2 = extract_text_from_item(item2)
-        if not processed2:
-            continue
-            
-        found_in_content1 = False
-        for item1 in content1:
-            processed1 = extract_text_from_item(item1)
-            if processed1 and processed1["type"] == processed2["type"]:
-                if processed1["type"] == "paragraph" and processed1["text"] == processed2["text"]:
-                    found_in_content1 = True
-                    break
-                elif processed1["type"] == "table":
-                    # Consider tables matching if they have the same structure
-                    if len(processed1["data"]["tableRows"]) == len(processed2["data"]["tableRows"]):
-                        found_in_content1 = True
-                        break
-        
-        if not found_in_content1:
+        else:
+            _, diff, item1, item2 = change
             structured_diffs.append({
-                "type": "added",
-                "content": processed2
+                "type": diff["type"],
+                "content": {
+                    "type": "table",
+                    "data": diff,
+                    "original": item1 if diff["type"] == "removed" else item2
+                }
             })
-    
+
+    for classified2 in added:
+        structured_diffs.append({
+            "type": "added",
+            "content": _describe(classified2)
+        })
+
     return structured_diffs
 
+def _json_response(payload):
+    """Serialize payload with orjson into a JSON response"""
+    return app.response_class(orjson.dumps(payload), mimetype="application/json")
+
+def _stream_json(diffs):
+    """Encode an iterable of diffs as a {"diffs": [...]} JSON body, one chunk per diff"""
+    yield b'{"diffs":['
+    for n, diff in enumerate(diffs):
+        yield b"," + orjson.dumps(diff) if n else orjson.dumps(diff)
+    yield b"]}"
+
 @app.route('/compare', methods=['POST', 'OPTIONS'])
 def compare_syllabi():
     if request.method == 'OPTIONS':
@@ -209,7 +295,7 @@ def compare_syllabi():
         
     try:
         print("Received comparison request")
-        data = request.json
+        data = orjson.loads(request.get_data(cache=False))
         content1 = data.get('content1', [])
         content2 = data.get('content2', [])
 
@@ -218,10 +304,24 @@ def compare_syllabi():
         if not content1 or not content2:
             return jsonify({"error": "Both content1 and content2 are required"}), 400
 
+        # Comparing a syllabus against an unchanged copy needs no diffing at all
+        if content1 == content2:
+            print("Documents are identical")
+            return _json_response({"diffs": []}), 200
+
+        # All diffing runs here so malformed input still fails with a 500
         diffs = diff_content(content1, content2)
-        print(f"Found {len(diffs)} differences")
-        
-        return jsonify({"diffs": diffs}), 200
+
+        # Flask-Compress can gzip a buffered body but not a stream, so only clients that
+        # accept gzip and none of the streaming encodings get a buffered response.
+        # Keep this in sync with COMPRESS_ALGORITHM_STREAMING / Flask-Compress negotiation.
+        accept_encodings = request.accept_encodings
+        if (not accept_encodings.best_match(app.config["COMPRESS_ALGORITHM_STREAMING"])
+                and accept_encodings.best_match(["gzip"])):
+            return _json_response({"diffs": diffs}), 200
+
+        # Serialize one diff at a time instead of holding the whole encoded body
+        return app.response_class(_stream_json(diffs), mimetype="application/json"), 200
         
     except Exception as e:
         print(f"Error in compare_syllabi: {str(e)}")
@@ -229,6 +329,19 @@ def compare_syllabi():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def _fetch_syllabus_list():
+    """Return the syllabus list, refetching it once the cached copy expires"""
+    now = time.monotonic()
+    if _syllabus_list_cache["data"] is not None and now < _syllabus_list_cache["expires"]:
+        return _syllabus_list_cache["data"]
+
+    response = _session.get(SYLLABUS_LIST_URL, timeout=5)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    _syllabus_list_cache["data"] = data
+    _syllabus_list_cache["expires"] = now + SYLLABUS_LIST_TTL
+    return data
+
 @app.route('/')
 def home():
     return "Hello", 200
@@ -236,11 +349,14 @@ def home():
 @app.route('/syllabus-list', methods=['GET'])
 def get_syllabus_list():
     try:
-        response = requests.get('https://fit.neu.edu.vn/codelab/api/syllabus-list')
-        return jsonify(response.json()), 200
+        return _json_response(_fetch_syllabus_list()), 200
     except Exception as e:
         print(f"Error fetching syllabus list: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8017, ssl_context="adhoc")
\ No newline at end of file
+    # Development server only; in production run `gunicorn app:app` (see gunicorn.conf.py)
+    certfile = os.environ.get("SSL_CERTFILE", "cert.pem")
+    keyfile = os.environ.get("SSL_KEYFILE", "key.pem")
+    ssl_context = (certfile, keyfile) if os.path.exists(certfile) and os.path.exists(keyfile) else "adhoc"
+    app.run(host="0.0.0.0", port=8017, ssl_context=ssl_context)
\ No newline at end of file
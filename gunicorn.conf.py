@@ -0,0 +1,14 @@
+# Production server settings, loaded automatically by `gunicorn app:app`.
+# diff_content is CPU-bound, so scale with worker processes rather than threads.
+import multiprocessing
+import os
+
+bind = "0.0.0.0:8017"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = 2
+
+# Generate these once (e.g. with openssl) instead of a fresh adhoc cert per start
+certfile = os.environ.get("SSL_CERTFILE", "cert.pem")
+keyfile = os.environ.get("SSL_KEYFILE", "key.pem")
+if not (os.path.exists(certfile) and os.path.exists(keyfile)):
+    certfile = keyfile = None